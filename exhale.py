@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
 
 import argparse
+import array
 import asyncio
 import collections
-import datetime
+import functools
 import glob
 import math
 import os
@@ -21,13 +22,29 @@ import adafruit_scd30
 # pip3 install adafruit-extended-bus
 import adafruit_extended_bus
 
+# pip3 install uvloop (optional; C event loop cuts timer/selector overhead)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
-class SwitchState(Enum):
-    ALIVE = 1
-    ON = 2
-    OFF = 3
-    WANT_ON = 4
-    WANT_OFF = 5
+
+# Verbose per-event logging; keep off in production so hot paths never
+# take the stdout lock.
+DEBUG = False
+
+# asyncio.timeout_at (Python 3.11+) costs one cancel scope per wait,
+# instead of one wait_for Future+TimerHandle per queue get.
+HAS_TIMEOUT_AT = hasattr(asyncio, "timeout_at")
+
+# Switch.q event encoding. Small ints are cheaper to enqueue and compare
+# than Enum members on the per-ValueChanged path, and the ordering lets
+# eat_q classify an event with a single comparison.
+EV_ALIVE = 0
+EV_OFF = 1
+EV_ON = 2
+EV_WANT_OFF = 3
+EV_WANT_ON = 4
 
 
 class SwitchAlive(Exception):
@@ -44,6 +61,10 @@ class FanState(Enum):
 
 
 class Switch:
+    __slots__ = ("node_id", "switch_id", "manager_set_value", "manual_secs",
+                 "onoff", "want_onoff", "_last_want", "_loop",
+                 "_deadline_ev", "q", "_q_ev", "task")
+
     def __init__(self, node_id, switch_id, manager_set_value, manual_secs):
         self.node_id = node_id
         self.switch_id = switch_id
@@ -51,28 +72,46 @@ class Switch:
         self.manual_secs = manual_secs
         self.onoff = False
         self.want_onoff = None
-        self.task = asyncio.create_task(self.run())
+        self._last_want = None
+        self._loop = asyncio.get_running_loop()
+        # Reused by eat_q for every finite wait, instead of allocating a
+        # fresh Event per window.
+        self._deadline_ev = asyncio.Event()
+
+        # Bounded deque of EV_* ints plus a wakeup Event; maxlen drops the
+        # oldest event for free when full.
+        self.q = collections.deque(maxlen=64)
+        self._q_ev = asyncio.Event()
 
-        # Queue of SwitchState enums.
-        self.q = asyncio.Queue()
+        # Construction is kept cheap; the caller invokes start() once it
+        # decides to keep this Switch (duplicate ValueAdded gets discarded
+        # without ever paying for a Task).
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
 
     def __str__(self):
         return "Switch node_id=%r, switch_id=%r, onoff=%r" % (self.node_id, self.switch_id, self.onoff)
 
+    def _push(self, v):
+        # No Future/waiter bookkeeping; setting an already-set Event is a
+        # cheap no-op.
+        self.q.append(v)
+        self._q_ev.set()
+
     def set_alive(self):
-        self.q.put_nowait(SwitchState.ALIVE)
+        self._push(EV_ALIVE)
 
     def set_onoff(self, v):
-        if v:
-            self.q.put_nowait(SwitchState.ON)
-        else:
-            self.q.put_nowait(SwitchState.OFF)
+        self._push(EV_ON if v else EV_OFF)
 
     def set_want_onoff(self, v):
-        if v:
-            self.q.put_nowait(SwitchState.WANT_ON)
-        else:
-            self.q.put_nowait(SwitchState.WANT_OFF)
+        # co2_sub publishes every tick; don't enqueue unchanged values.
+        if v == self._last_want:
+            return
+        self._last_want = v
+        self._push(EV_WANT_ON if v else EV_WANT_OFF)
 
     async def run(self):
         try:
@@ -129,13 +168,16 @@ class Switch:
                     break
 
     async def send_and_ignore(self, value, duration):
-        print("send_and_ignore", value, duration)
-        self.manager_set_value(self.switch_id, value)
+        if DEBUG:
+            print("send_and_ignore", value, duration)
+        # setValue enters libopenzwave's serial I/O; don't block the loop.
+        await asyncio.to_thread(self.manager_set_value, self.switch_id, value)
         await self.eat_q(duration=duration)
 
     async def send_and_debounce(self, value, duration):
-        print("send_and_debounce", value, duration)
-        self.manager_set_value(self.switch_id, value)
+        if DEBUG:
+            print("send_and_debounce", value, duration)
+        await asyncio.to_thread(self.manager_set_value, self.switch_id, value)
         # Wait for the state to settle.
         await self.eat_q(duration=duration)
         # If it settled to the wrong value, blame the human.
@@ -143,55 +185,106 @@ class Switch:
             raise SwitchToggled
 
     async def eat_q(self, duration, monitor_toggled=False):
+        # Bind hot-loop names to locals; this loop runs once per event.
+        popleft = self.q.popleft
+
         if duration is None:
             # Wait indefinitely for the first event,
             # then stop as soon as the queue is empty.
             stop_on_empty = True
+            deadline_task = None
         else:
-            # Wait until the duration expires.
-            wait_until = time.monotonic() + duration
+            # Wait until the duration expires, scheduling one timer for
+            # the whole window instead of one per consumed event.
             stop_on_empty = False
+            deadline_ev = self._deadline_ev
+            deadline_ev.clear()
+            timer = self._loop.call_later(duration, deadline_ev.set)
+            deadline_task = asyncio.ensure_future(deadline_ev.wait())
 
         alive = False
         toggled = False
+        got_any = False
+        ev_task = None
 
-        while True:
-            try:
-                v = await asyncio.wait_for(self.q.get(), duration)
-                #print("eat_q v=", v)
-            except asyncio.TimeoutError:
-                #print("eat_q timeout", alive, toggled)
-                if alive:
-                    raise SwitchAlive
-                if toggled:
-                    raise SwitchToggled
-                return
-
-            if v == SwitchState.ALIVE:
-                alive = True
-                stop_on_empty = True
-            elif v in (SwitchState.ON, SwitchState.OFF):
-                onoff = (v == SwitchState.ON)
-                #print("onoff=%r" % onoff)
-                if self.onoff != onoff:
-                    self.onoff = onoff
-                    if monitor_toggled:
-                        print("TOGGLED!")
-                        toggled = True
-                        stop_on_empty = True
-            elif v in (SwitchState.WANT_ON, SwitchState.WANT_OFF):
-                self.want_onoff = (v == SwitchState.WANT_ON)
-                #print("want_onoff=%r" % self.want_onoff)
-
-            if stop_on_empty:
-                duration = 0
-            else:
-                duration = wait_until - time.monotonic()
+        try:
+            while True:
+                try:
+                    # Fast path: drain without waking the event loop.
+                    v = popleft()
+                except IndexError:
+                    # All producers run on the loop thread, so clearing
+                    # here can't race a concurrent append.
+                    self._q_ev.clear()
+                    woke = False
+                    if not (stop_on_empty and got_any):
+                        if deadline_task is None:
+                            await self._q_ev.wait()
+                            woke = True
+                        elif not deadline_ev.is_set():
+                            if ev_task is None:
+                                ev_task = asyncio.ensure_future(
+                                        self._q_ev.wait())
+                            done, _ = await asyncio.wait(
+                                    (ev_task, deadline_task),
+                                    return_when=asyncio.FIRST_COMPLETED)
+                            if ev_task in done:
+                                ev_task = None
+                                woke = True
+                    if not woke:
+                        #print("eat_q timeout", alive, toggled)
+                        if alive:
+                            raise SwitchAlive
+                        if toggled:
+                            raise SwitchToggled
+                        return
+                    continue
+                got_any = True
+
+                if v == EV_ALIVE:
+                    alive = True
+                    stop_on_empty = True
+                elif v <= EV_ON:
+                    onoff = (v == EV_ON)
+                    #print("onoff=%r" % onoff)
+                    if self.onoff != onoff:
+                        self.onoff = onoff
+                        if monitor_toggled:
+                            if DEBUG:
+                                print("TOGGLED!")
+                            toggled = True
+                            stop_on_empty = True
+                else:
+                    self.want_onoff = (v == EV_WANT_ON)
+                    #print("want_onoff=%r" % self.want_onoff)
+        finally:
+            if deadline_task is not None:
+                timer.cancel()
+                deadline_task.cancel()
+            if ev_task is not None:
+                ev_task.cancel()
 
 
 def is_a_switch(zwargs):
-    return (zwargs["valueId"]["commandClass"] == "COMMAND_CLASS_SWITCH_BINARY" and
-            zwargs["valueId"]["index"] == 0)
+    # One dict lookup for valueId, then locals.
+    vid = zwargs["valueId"]
+    return (vid["commandClass"] == "COMMAND_CLASS_SWITCH_BINARY" and
+            vid["index"] == 0)
+
+
+# Notification types that the asyncio side actually consumes; anything else
+# is dropped on the watcher thread, before paying for a cross-thread wakeup.
+DRIVER_READY = frozenset(("DriverReady",))
+DRIVER_REMOVED = frozenset(("DriverRemoved",))
+NODES_QUERIED = frozenset((
+    "AllNodesQueried",
+    "AllNodesQueriedSomeDead",
+    "AwakeNodesQueried",
+))
+CONTROLLER_COMMAND = frozenset(("ControllerCommand",))
+VALUE_ADDED = frozenset(("ValueAdded",))
+INTERESTING_NOTIFY_TYPES = (DRIVER_READY | DRIVER_REMOVED | NODES_QUERIED |
+                            CONTROLLER_COMMAND | frozenset(("Notification",)))
 
 
 class StateTracker:
@@ -199,151 +292,343 @@ class StateTracker:
         self._manager_set_value = manager_set_value
         self._manual_secs = manual_secs
         self._loop = asyncio.get_running_loop()
-        self._q = asyncio.Queue()
+        self._call_soon_threadsafe = self._loop.call_soon_threadsafe
+        # Events append here from the watcher thread; one scheduled
+        # _drain_incoming call moves whole bursts onto the loop.
+        self._incoming = collections.deque()
+        self._drain_scheduled = False
+        # Last ValueChanged value seen per node, used to drop unchanged
+        # reports on the watcher thread. Only that thread writes it.
+        self._last_vc = {}
+        # Match buffer: plain deque plus a single waiter Future, instead
+        # of asyncio.Queue and its per-get Future/getters machinery.
+        # maxlen drops the oldest event to bound memory during storms.
+        self._buf = collections.deque(maxlen=1024)
+        self._waiter = None
+        self._matching = False
         self._nodes_queried = False
         self.switches = {}
         self.home_id = None
+        self._handlers = {
+            "ValueAdded": self._on_value_added,
+            "ValueChanged": self._on_value_changed,
+            "Notification": self._on_notification,
+        }
 
     def threadsafe_watcher_cb(self, zwargs):
-        #print(f"zwave event: {datetime.datetime.now().isoformat(sep=' ')} {zwargs}")
-        self._loop.call_soon_threadsafe(lambda: self._q.put_nowait(zwargs))
+        #print(f"zwave event: {time.strftime('%Y-%m-%d %H:%M:%S')} {zwargs}")
+        ntype = zwargs["notificationType"]
+        if ntype in ("ValueAdded", "ValueChanged"):
+            if not is_a_switch(zwargs):
+                return
+            if ntype == "ValueAdded":
+                # A fresh Switch must see its first report even if the
+                # value matches what the node reported before a reset.
+                self._last_vc.pop(zwargs["nodeId"], None)
+            else:
+                # Polling re-reports unchanged values; dropping them here
+                # is lossless, since toggle detection only ever reacts to
+                # a value that differs from the one before it.
+                node_id = zwargs["nodeId"]
+                value = zwargs["valueId"]["value"]
+                if self._last_vc.get(node_id) == value:
+                    return
+                self._last_vc[node_id] = value
+        elif ntype not in INTERESTING_NOTIFY_TYPES:
+            return
+        # Soft cap during notification storms: shed the spammy alive
+        # Notifications first, so driver/value events always get through
+        # and memory stays bounded while the loop thread catches up.
+        if len(self._incoming) >= 4096 and ntype == "Notification":
+            return
+        # deque.append is thread-safe under the GIL; only pay for a
+        # cross-thread wakeup when a drain isn't already pending.
+        self._incoming.append(zwargs)
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            self._call_soon_threadsafe(self._drain_incoming)
+
+    def _drain_incoming(self):
+        # Clear the flag before draining, so a concurrent append either
+        # lands in this drain or schedules the next one.
+        self._drain_scheduled = False
+        prev_key = None
+        while True:
+            try:
+                zwargs = self._incoming.popleft()
+            except IndexError:
+                return
+            # ZWave bursts tend to repeat the same report back-to-back
+            # (e.g. duplicate ValueChanged after AllNodesQueried). Collapse
+            # exact consecutive repeats; unlike latest-wins batching this
+            # can't hide a flap that returns to the same state, which
+            # manual-toggle detection needs to see.
+            ntype = zwargs["notificationType"]
+            if ntype == "ValueChanged":
+                key = (ntype, zwargs["nodeId"], zwargs["valueId"]["value"])
+            elif ntype == "Notification":
+                key = (ntype, zwargs["nodeId"], zwargs["notificationCode"])
+            else:
+                key = None
+            if key is not None and key == prev_key:
+                continue
+            prev_key = key
+            self._dispatch(zwargs)
+
+    def _dispatch(self, zwargs):
+        # Runs on the loop thread. The always-on bookkeeping happens right
+        # here, at dispatch time; the queue only buffers for an active
+        # _match, so nothing accumulates in steady state.
+        self._handle(zwargs)
+        if self._matching:
+            self._push(zwargs)
+
+    def _push(self, zwargs):
+        self._buf.append(zwargs)
+        waiter = self._waiter
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
 
     async def wait_for_nodes(self):
         if self.home_id is not None:
             raise AssertionError("Can't wait_for_nodes() with existing home_id")
-        zwargs = await self._match("DriverReady")
+        # One deadline covers the whole sequence; each phase no longer
+        # restarts its own 60s budget.
+        deadline = self._loop.time() + 120
+        zwargs = await self._match(DRIVER_READY,
+                                   timeout=deadline - self._loop.time())
         self.home_id = zwargs["homeId"]
-        await self._match("AllNodesQueried|AllNodesQueriedSomeDead|AwakeNodesQueried")
+        await self._match(NODES_QUERIED,
+                          timeout=deadline - self._loop.time())
         self._nodes_queried = True
         for switch in self.switches.values():
             switch.set_alive()
 
     async def wait_for_driver_removed(self):
-        await self._match("DriverRemoved")
+        await self._match(DRIVER_REMOVED)
         self.home_id = None
         self._nodes_queried = False
         for switch in self.switches.values():
             switch.task.cancel()
         self.switches.clear()
+        self._last_vc.clear()
 
     async def wait_for_controller_state(self, cs):
-        return await self._match("ControllerCommand", lambda z: z["controllerState"] == cs)
+        return await self._match(CONTROLLER_COMMAND, lambda z: z["controllerState"] == cs)
 
     async def wait_for_switch_added(self):
         zwargs = await self._match(
-                "ValueAdded",
+                VALUE_ADDED,
                 is_a_switch,
                 timeout=15*60)  # Wait 15 minutes for user to add the switch.
         return zwargs["valueId"]["id"]
 
     async def wait_until(self, mono_ts):
-        while True:
-            timeout = mono_ts - time.monotonic()
-            if timeout <= 0:
-                break
-            try:
-                await self._q_get(timeout)
-            except asyncio.TimeoutError:
-                pass
+        # Events are fully handled at dispatch time, so pacing is just a
+        # sleep; no TimeoutError churn, no queue pumping.
+        timeout = mono_ts - self._loop.time()
+        if timeout > 0:
+            await asyncio.sleep(timeout)
 
-    # notify_types = "Type1|Type2|..."
+    # notify_types = frozenset of notificationType strings.
     # zwargs_matcher = f(zwargs) -> True if match.
     async def _match(self, notify_types, zwargs_matcher=None, timeout=60):
-        notify_types = notify_types.split("|")
         note =  " with zwargs_matcher" if zwargs_matcher else ""
-        print(f"=== Waiting for {notify_types}{note} ===")
+        print(f"=== Waiting for {sorted(notify_types)}{note} ===")
+        # One fixed deadline instead of re-reading the clock twice per
+        # iteration to shrink a running timeout.
+        deadline = self._loop.time() + timeout
+        # Buffering is enabled synchronously here and disabled in the
+        # finally below, so an event can't slip between back-to-back
+        # _match calls (the gap contains no await).
+        self._matching = True
+        try:
+            if HAS_TIMEOUT_AT:
+                # A single cancel scope covers the whole match.
+                async with asyncio.timeout_at(deadline):
+                    return await self._match_loop(notify_types,
+                                                  zwargs_matcher, None)
+            return await self._match_loop(notify_types, zwargs_matcher,
+                                          deadline)
+        finally:
+            self._matching = False
+
+    async def _match_loop(self, notify_types, zwargs_matcher, deadline):
+        mono = self._loop.time
+        buf = self._buf
         while True:
-            start = time.monotonic()
-            zwargs = await self._q_get(timeout=timeout)
-            timeout -= (time.monotonic() - start)
+            try:
+                # Drain bursts in one pass; a Future is only allocated
+                # when we actually have to wait.
+                zwargs = buf.popleft()
+            except IndexError:
+                waiter = self._loop.create_future()
+                self._waiter = waiter
+                try:
+                    if deadline is None:
+                        await waiter
+                    else:
+                        await asyncio.wait_for(waiter, deadline - mono())
+                finally:
+                    self._waiter = None
+                continue
             if zwargs["notificationType"] not in notify_types:
                 continue
             if zwargs_matcher and not zwargs_matcher(zwargs):
                 continue
             return zwargs
 
-    async def _q_get(self, timeout):
-        zwargs = await asyncio.wait_for(self._q.get(), timeout=timeout)
-        self._q.task_done()
-
-        # Check for events that we're always waiting for.
-        ntype = zwargs["notificationType"]
-        if ntype == "ValueAdded" and is_a_switch(zwargs):
-            node_id = zwargs["nodeId"]
-            switch_id = zwargs["valueId"]["id"]
-            switch = Switch(node_id, switch_id, self._manager_set_value, self._manual_secs)
-            try:
-                self.switches[node_id].task.cancel()
-                print("Destroyed duplicate switch with node_id %r" % node_id)
-            except KeyError:
-                pass
-            self.switches[node_id] = switch
-            print(f"Tracking {switch}")
-        elif ntype == "ValueChanged" and is_a_switch(zwargs):
-            node_id = zwargs["nodeId"]
-            switch_id = zwargs["valueId"]["id"]
-            onoff = zwargs["valueId"]["value"]
-            try:
-                switch = self.switches[node_id]
-                if switch.switch_id != switch_id:
-                    raise KeyError
-            except KeyError:
-                print("Unknown switch %r" % node_id)
-            else:
-                switch.set_onoff(onoff)
-        elif ntype == "Notification" and zwargs["notificationCode"] == 6:
-            node_id = zwargs["nodeId"]
-            try:
-                switch = self.switches[node_id]
-            except KeyError:
-                pass
-            else:
-                if self._nodes_queried:
-                    switch.set_alive()
-                print("Switch %r alive" % node_id)
+    def _handle(self, zwargs):
+        # Check for events that we're always waiting for. O(1) dispatch;
+        # most notification types have no always-on handler.
+        handler = self._handlers.get(zwargs["notificationType"])
+        if handler is not None:
+            handler(zwargs)
+
+    # threadsafe_watcher_cb already established is_a_switch() for
+    # ValueAdded/ValueChanged, so the handlers don't re-check it.
+    def _on_value_added(self, zwargs):
+        node_id = zwargs["nodeId"]
+        switch_id = zwargs["valueId"]["id"]
+        switch = Switch(node_id, switch_id, self._manager_set_value, self._manual_secs)
+        try:
+            self.switches[node_id].task.cancel()
+            print("Destroyed duplicate switch with node_id %r" % node_id)
+        except KeyError:
+            pass
+        self.switches[node_id] = switch
+        switch.start()
+        print(f"Tracking {switch}")
+
+    def _on_value_changed(self, zwargs):
+        node_id = zwargs["nodeId"]
+        vid = zwargs["valueId"]
+        switch_id = vid["id"]
+        onoff = vid["value"]
+        try:
+            switch = self.switches[node_id]
+            if switch.switch_id != switch_id:
+                raise KeyError
+        except KeyError:
+            print("Unknown switch %r" % node_id)
+        else:
+            switch.set_onoff(onoff)
 
-        return zwargs
+    def _on_notification(self, zwargs):
+        if zwargs["notificationCode"] != 6:
+            return
+        node_id = zwargs["nodeId"]
+        try:
+            switch = self.switches[node_id]
+        except KeyError:
+            pass
+        else:
+            if self._nodes_queried:
+                switch.set_alive()
+            print("Switch %r alive" % node_id)
 
 
 class Averager:
-    def __init__(self, twindow):
-        self.q = collections.deque()
+    def __init__(self, twindow, min_period):
         self.twindow = twindow  # Average over this time window (seconds)
+        # Parallel rings of C doubles (no per-sample tuple objects), sized
+        # so samples arriving every min_period seconds fill the window
+        # without wrapping.
+        self._cap = int(twindow / min_period) + 1
+        self._ts = array.array("d", bytes(8 * self._cap))
+        self._values = array.array("d", bytes(8 * self._cap))
+        self._head = 0  # next slot to write
+        self._tail = 0  # oldest live slot
+        self._count = 0
+        self._sum = 0.0
 
     def add(self, now, value):
-        if self.q and self.q[0][0] > now:
+        if self._count and self._ts[self._head - 1] > now:
             raise AssertionError("must use time.monotonic()")
 
-        # Add new value, and purge values older than twindow.
-        self.q.appendleft((now, value))
-        while self.q[-1][0] <= now - self.twindow:
-            self.q.pop()
+        # Purge values older than twindow, plus the oldest value if the ring
+        # is full (samples arrived faster than min_period.)
+        cutoff = now - self.twindow
+        while self._count and (self._count == self._cap or
+                               self._ts[self._tail] <= cutoff):
+            self._sum -= self._values[self._tail]
+            self._tail = (self._tail + 1) % self._cap
+            self._count -= 1
+
+        self._ts[self._head] = now
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self._cap
+        self._count += 1
+        self._sum += value
 
     def is_fresh(self, now):
         # Is the latest value still within the window?
-        return self.q and self.q[0][0] > now - self.twindow
+        return (self._count > 0 and
+                self._ts[self._head - 1] > now - self.twindow)
 
     def compute_avg(self):
-        return sum(value for ts, value in self.q) / (len(self.q) or 1)
+        # The running sum makes this O(1) instead of an O(N) re-sum.
+        return self._sum / (self._count or 1)
+
+
+class Ewma:
+    def __init__(self, tau):
+        self.tau = tau  # Smoothing time constant (seconds)
+        self.v = 0.0
+        self._last = None
+
+    def update(self, now, x):
+        # Exponential moving average: O(1) state, no ring of samples.
+        if self._last is None:
+            self.v = float(x)
+        else:
+            alpha = 1.0 - math.exp((self._last - now) / self.tau)
+            self.v += alpha * (x - self.v)
+        self._last = now
 
 
 class CO2Reader:
     def __init__(self, scd30_i2c):
         i2c = adafruit_extended_bus.ExtendedI2C(discover_scd30_i2c(scd30_i2c))
         self.scd = adafruit_scd30.SCD30(i2c)
+        self._loop = asyncio.get_running_loop()
+        # The sensor produces one sample per measurement_interval (~2s), so
+        # schedule the next poll from the last successful read instead of
+        # blindly waking up every 0.5s.
+        try:
+            self._interval = float(self.scd.measurement_interval)
+        except (OSError, ValueError):
+            self._interval = 2.0
+        self._next_ready = 0.0
+
+    def _read_sample(self):
+        # Runs on a worker thread; both properties are blocking I2C
+        # transactions. Returns False when no sample is ready yet.
+        if not self.scd.data_available:
+            return False
+        return self.scd.CO2
 
     async def read(self):
         while True:
-            if not self.scd.data_available:
-                await asyncio.sleep(0.5)
+            delay = self._next_ready - self._loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Keep the event loop free to drain ZWave callbacks while the
+            # I2C bus is busy.
+            co2 = await self._loop.run_in_executor(None, self._read_sample)
+
+            if co2 is False:
+                # Expected the sample by now; re-poll at a short interval.
+                self._next_ready = self._loop.time() + 0.2
                 continue
 
-            co2 = self.scd.CO2
             if co2 is None or not math.isfinite(co2):
                 print(f"ignored co2={co2}")
-                await asyncio.sleep(0.5)
+                self._next_ready = self._loop.time() + 0.5
                 continue
 
+            self._next_ready = self._loop.time() + self._interval
             return co2
 
 
@@ -351,7 +636,9 @@ class CO2Tracker:
     def __init__(self, blinker, scd30_i2c):
         self.blinker = blinker
         self.scd30_i2c = scd30_i2c
-        self.avgr = Averager(60)
+        self._loop = asyncio.get_running_loop()
+        # CO2Reader polls every 0.5s, so size for that worst-case cadence.
+        self.avgr = Averager(60, 0.5)
         self.task = asyncio.create_task(self.run())
 
     async def run(self):
@@ -369,41 +656,54 @@ class CO2Tracker:
 
         while True:
             co2 = await reader.read()
-            now = time.monotonic()
+            now = self._loop.time()
             self.avgr.add(now, co2)
 
             co2_avg = self.compute_co2_avg()
             self.blinker.blink_number(co2_avg // 100)
 
     def compute_co2_avg(self):
-        now = time.monotonic()
+        now = self._loop.time()
         if self.avgr.is_fresh(now):
-            co2_avg = int(self.avgr.compute_avg())
             # Enforce reasonable limits for the blinker.
-            if co2_avg < 100:
-                co2_avg = 100
-            if co2_avg > 2000:
-                co2_avg = 2000
-            return co2_avg
+            return max(100, min(2000, int(self.avgr.compute_avg())))
         else:
             return 0  # No data... this will turn off the fan.
 
 
+# Only ~21 distinct numbers ever get blinked (co2_avg // 100), so the
+# (led_state, sleep_seconds) programs are computed once and reused.
+@functools.lru_cache(maxsize=32)
+def blink_schedule(number):
+    prog = []
+    for i in range(number):
+        prog.append((0, 0.2))
+        if (i + 1) % 5 == 0:
+            # Longer pulse marks every fifth blink.
+            prog.append((1, 0.3))
+            prog.append((0, 0.0))
+        else:
+            prog.append((1, 0.1))
+            prog.append((0, 0.2))
+    return tuple(prog)
+
+
 class Blinker:
     def __init__(self):
-        self.q = asyncio.Queue(maxsize=1)
+        # Single latest-value slot; a stale number is never blinked.
+        self._latest = None
+        self._ev = asyncio.Event()
         self.hz = None
         self.task = asyncio.create_task(self.run())
 
     def blink_number(self, number):
-        try:
-            self.q.put_nowait(number)
-        except asyncio.QueueFull:
-            pass
+        self._latest = number
         self.hz = None
+        self._ev.set()
 
     def blink_hz(self, hz):
         self.hz = hz
+        self._ev.set()
 
     async def run(self):
         try:
@@ -421,44 +721,62 @@ class Blinker:
         # Le Potato green LED:
         #   chmod a+w /sys/class/leds/librecomputer:system-status/brightness
         #   ln -s /sys/class/leds/librecomputer:system-status/brightness /tmp/exhale.led
-        with open("/tmp/exhale.led", "w") as f:
-            async def write_n(n, sleep_time=None):
-                f.write("%d\n" % n)
-                f.flush()
-                if sleep_time is not None:
-                    await asyncio.sleep(sleep_time)
+        fd = os.open("/tmp/exhale.led", os.O_WRONLY)
+        try:
+            # One pre-encoded write(2) per blink; no buffered-io layer.
+            # set_led is a plain function (sysfs writes don't block), so
+            # each LED toggle costs no coroutine frame of its own.
+            LED_BYTES = (b"0\n", b"1\n")
+            sleep = asyncio.sleep
+            def set_led(n):
+                os.write(fd, LED_BYTES[n])
             while True:
                 if self.hz:
                     # Blink continuously.
-                    await write_n(1, 0.5 / self.hz)
-                    await write_n(0, 0.5 / self.hz)
+                    set_led(1)
+                    await sleep(0.5 / self.hz)
+                    set_led(0)
+                    await sleep(0.5 / self.hz)
                     continue
 
-                number = await self.q.get()
+                if self._latest is None:
+                    # Sleep until blink_number/blink_hz has news.
+                    self._ev.clear()
+                    await self._ev.wait()
+                    continue
+                number = self._latest
+                self._latest = None
                 #print(f"blink {number}")
-                self.q.task_done()
-                for i in range(number):
-                    if (i + 1) % 5 == 0:
-                        await write_n(0, 0.2)
-                        await write_n(1, 0.3)
-                        await write_n(0, 0.0)
-                    else:
-                        await write_n(0, 0.2)
-                        await write_n(1, 0.1)
-                        await write_n(0, 0.2)
-                await asyncio.sleep(3.0)
+                for state, dur in blink_schedule(number):
+                    set_led(state)
+                    if dur:
+                        await sleep(dur)
+                await sleep(3.0)
+        finally:
+            os.close(fd)
+
+
+ZDEVICE_GLOBS = (
+    # Le Potato "ldto enable uarta" -- not sure where 6 comes from.
+    "/dev/ttyAML6",
+    # RasPi "raspi-config nonint do_serial 2"
+    "/dev/ttyS0",
+)
+
+SCD30_I2C_GLOBS = (
+    # Raspberry Pi dtoverlay=i2c-gpio,bus=302,...
+    "/dev/i2c-302",
+    # lepotato/i2c-exhale.dts
+    "/sys/devices/platform/i2c-exhale/i2c-*",
+)
+
+TRAILING_DIGITS_RE = re.compile("[0-9]+$")
 
 
 def discover_zdevice(zdevice):
     if zdevice is not None:
         return zdevice
-    GLOBS = [
-        # Le Potato "ldto enable uarta" -- not sure where 6 comes from.
-        "/dev/ttyAML6",
-        # RasPi "raspi-config nonint do_serial 2"
-        "/dev/ttyS0",
-    ]
-    for g in GLOBS:
+    for g in ZDEVICE_GLOBS:
         for zdevice in glob.glob(g):
             print(f"Discovered --zdevice={zdevice}")
             return zdevice
@@ -467,15 +785,9 @@ def discover_zdevice(zdevice):
 def discover_scd30_i2c(scd30_i2c):
     if scd30_i2c is not None:
         return scd30_i2c
-    GLOBS = [
-        # Raspberry Pi dtoverlay=i2c-gpio,bus=302,...
-        "/dev/i2c-302",
-        # lepotato/i2c-exhale.dts
-        "/sys/devices/platform/i2c-exhale/i2c-*",
-    ]
-    for g in GLOBS:
+    for g in SCD30_I2C_GLOBS:
         for path in glob.glob(g):
-            m = re.search("[0-9]+$", path)
+            m = TRAILING_DIGITS_RE.search(path)
             if not m:
                 continue
             scd30_i2c = int(m.group(0))
@@ -484,7 +796,18 @@ def discover_scd30_i2c(scd30_i2c):
     raise ValueError("Failed to discover --scd30_i2c")
 
 
+def enable_eager_tasks():
+    # Python 3.12+: start tasks synchronously until their first suspension,
+    # skipping one scheduler round-trip per create_task.
+    factory = getattr(asyncio, "eager_task_factory", None)
+    if factory is not None:
+        asyncio.get_running_loop().set_task_factory(factory)
+
+
 async def hard_reset(args):
+    loop = asyncio.get_running_loop()
+    enable_eager_tasks()
+
     def manager_set_value(switch_id, value):
         print("ignored manager_set_value")
 
@@ -500,7 +823,7 @@ async def hard_reset(args):
 
     # This seems necessary since openzwave added a bunch of ZWave+ junk.
     print("Sleeping for 10 seconds...")
-    await st.wait_until(time.monotonic() + 10)
+    await st.wait_until(loop.time() + 10)
 
     print("Resetting controller...")
     manager.resetController(st.home_id)
@@ -518,7 +841,7 @@ async def hard_reset(args):
         manager.setValue(switch_id, False)
 
     print("Sleeping for 5 seconds...")
-    await st.wait_until(time.monotonic() + 5)
+    await st.wait_until(loop.time() + 5)
     print("Destroying...")
     manager.destroy()
     print("Done!")
@@ -528,7 +851,8 @@ async def calibrate(args):
     blinker = Blinker()
     reader = CO2Reader(args.scd30_i2c)
 
-    target = time.monotonic() + 120  # calibrate in 2 minutes
+    loop = asyncio.get_running_loop()
+    target = loop.time() + 120  # calibrate in 2 minutes
     blinker.blink_hz(0.5)  # blink slowly
     ppm = args.scd30_ppm
     info = f"(scd30_ppm={ppm})" if ppm else "(dry_run)"
@@ -537,7 +861,7 @@ async def calibrate(args):
 
     while True:
         co2 = int(await reader.read())
-        remain = max(0, math.ceil(target - time.monotonic()))
+        remain = max(0, math.ceil(target - loop.time()))
         print(f"co2={co2}, calibrate in {remain}s {info}")
         if remain <= 0:
             break
@@ -554,6 +878,7 @@ async def calibrate(args):
 
 
 async def co2_main(args):
+    enable_eager_tasks()
     blinker = Blinker()
     co2_tracker = CO2Tracker(blinker, args.scd30_i2c)
     try:
@@ -563,7 +888,8 @@ async def co2_main(args):
         co2_tracker.task.cancel()
 
 async def co2_sub(args, co2_tracker):
-    boot_time = time.monotonic()
+    loop = asyncio.get_running_loop()
+    boot_time = loop.time()
 
     def manager_set_value(switch_id, value):
         manager.setValue(switch_id, value)
@@ -585,10 +911,17 @@ async def co2_sub(args, co2_tracker):
 
     fan = FanState.OFF
 
-    duty_1h_avgr = Averager(1*3600)
-    duty_24h_avgr = Averager(24*3600)
+    # Smoothed duty cycles for the log line; EWMAs cost O(1) state where
+    # windowed averages would store every ~10s sample.
+    duty_1h_ewma = Ewma(1*3600)
+    duty_24h_ewma = Ewma(24*3600)
     last_uniq = None
 
+    # Ticks follow an absolute schedule, so per-iteration work doesn't
+    # slowly push the period later.
+    TICK = 137/13
+    next_tick = loop.time()
+
     while True:
         co2 = co2_tracker.compute_co2_avg()
         if co2 >= args.co2_limit:
@@ -599,32 +932,31 @@ async def co2_sub(args, co2_tracker):
         for switch in st.switches.values():
             switch.set_want_onoff(fan.value)
 
-        now = time.monotonic()
-        duty_1h_avgr.add(now, fan.value)
-        duty_24h_avgr.add(now, fan.value)
+        now = loop.time()
+        duty_1h_ewma.update(now, fan.value)
+        duty_24h_ewma.update(now, fan.value)
 
         # Round up, so any activity reports >= 1%
-        duty_1h = math.ceil(duty_1h_avgr.compute_avg() * 100)
-        duty_24h = math.ceil(duty_24h_avgr.compute_avg() * 100)
-
-        # Log every 5 minutes, or when fan state changes.
-        dt_now = datetime.datetime.now()
-        dt_5min = dt_now - datetime.timedelta(
-                minutes=dt_now.minute % 5,
-                seconds=dt_now.second,
-                microseconds=dt_now.microsecond)
+        duty_1h = math.ceil(duty_1h_ewma.v * 100)
+        duty_24h = math.ceil(duty_24h_ewma.v * 100)
 
-        uniq = (dt_5min, fan)
+        # Log every 5 minutes, or when fan state changes. The bucket uses
+        # cheap integer math; the timestamp is only built when logging.
+        uniq = (int((now - boot_time) // 300), fan)
         if uniq != last_uniq:
-            dt_nowf = dt_now.replace(microsecond=0).isoformat(sep=" ")
+            dt_nowf = time.strftime("%Y-%m-%d %H:%M:%S")
             uptime = int((now - boot_time) // 3600)
             print(f"{dt_nowf} co2={co2} fan={fan.name} "
                   f"uptime={uptime}h duty_1h={duty_1h}% duty_24h={duty_24h}%",
                   flush=True)
             last_uniq = uniq
 
-        # Passively consume messages for ~10 seconds.
-        await st.wait_until(now + 137/13)
+        # Sleep until the next ~10 second tick; if we fell behind (e.g.
+        # system suspend), skip ahead instead of bursting to catch up.
+        next_tick += TICK
+        if next_tick <= now:
+            next_tick = now + TICK
+        await st.wait_until(next_tick)
 
 
 # https://stackoverflow.com/questions/20094215/argparse-subparser-monolithic-help-output
@@ -680,6 +1012,8 @@ def main():
         options.addOptionBool("AutoUpdateConfigFile", False)
         options.lock()
 
+        if uvloop is not None:
+            uvloop.install()
         asyncio.run(args.func(args))
 
 